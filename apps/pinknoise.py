@@ -1,37 +1,45 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from scipy import fft as sp_fft
 from scipy.signal import welch
+from joblib import Parallel, delayed
+import imageio.v3 as iio
 import sys
 
-def generate_pink_noise(N):
+def generate_pink_noise(N, seed=None):
     """
     Generate 1/f pink noise by filtering white noise in the frequency domain.
     
     Parameters:
         N (int): Number of samples.
+        seed (int, optional): Seed for the random number generator.
         
     Returns:
         pink (numpy.ndarray): Generated pink noise signal.
     """
     # Generate white noise
-    white = np.random.randn(N)
+    rng = np.random.default_rng(seed)
+    white = rng.standard_normal(N)
     
     # Perform FFT
-    f = np.fft.rfft(white)
-    freqs = np.fft.rfftfreq(N, d=1.0)
+    f = sp_fft.rfft(white, workers=-1)
+    freqs = sp_fft.rfftfreq(N, d=1.0)
     
-    # Avoid division by zero at the zero frequency
-    freqs[0] = freqs[1] if len(freqs) > 1 else 1.0
+    # 1/sqrt(f) filter, reusing the first nonzero bin at zero frequency to avoid division by zero
+    inv_sqrt_f = np.empty_like(freqs)
+    inv_sqrt_f[1:] = freqs[1:] ** -0.5
+    inv_sqrt_f[0] = inv_sqrt_f[1] if len(freqs) > 1 else 1.0
     
-    # Apply 1/f filter to get pink noise
-    f_filtered = f / np.sqrt(freqs)
+    # Apply 1/f filter in place to get pink noise
+    f *= inv_sqrt_f
     
     # Perform inverse FFT to get time-domain signal
-    pink = np.fft.irfft(f_filtered, n=N)
+    pink = sp_fft.irfft(f, n=N, workers=-1, overwrite_x=True)
     
-    # Normalize the signal
-    pink = (pink - np.mean(pink)) / np.std(pink)
+    # Normalize the signal in place
+    pink -= pink.mean()
+    pink /= pink.std()
     
     return pink
 
@@ -61,50 +69,52 @@ def fractal_dimension_1d(signal, box_sizes=None):
     log_sizes = np.log(1 / box_sizes)
     log_N = np.log(N)
     
-    # Perform linear fit to estimate the slope (fractal dimension)
-    coeffs = np.polyfit(log_sizes, log_N, 1)
-    D = coeffs[0]
+    # Closed-form least-squares slope of log_N vs log_sizes (fractal dimension)
+    dx = log_sizes - log_sizes.mean()
+    dy = log_N - log_N.mean()
+    D = (dx * dy).sum() / (dx * dx).sum()
     
     return D
 
-def create_pink_noise_gif():
+def _precompute_frame(pink, idx):
     """
-    Create a GIF animation of pink noise with accompanying Fractal Dimension and PSD plots.
+    Compute the fractal dimension and PSD of the first idx samples of the signal.
+    
+    Parameters:
+        pink (numpy.ndarray): Full pink noise signal.
+        idx (int): Number of leading samples to analyse.
+        
+    Returns:
+        tuple: (D, freq, psd) for the segment.
     """
-    # Parameters
-    N = 2048                   # Total number of samples
-    num_frames = 200           # Number of frames in the GIF
-    step = max(1, N // num_frames)  # Step size for each frame
+    segment = pink[:idx]
     
-    # Generate pink noise
-    pink = generate_pink_noise(N)
+    # Estimate fractal dimension
+    D = fractal_dimension_1d(segment)
     
-    # Precompute fractal dimensions and PSDs for all frames
-    fractal_dims = []
-    freqs_all = []
-    psd_all = []
+    # Compute PSD using Welch's method
+    freq, psd = welch(segment, nperseg=min(256, len(segment)))
     
-    print("Precomputing Fractal Dimensions and PSDs...")
-    for i in range(1, num_frames + 1):
-        idx = i * step
-        if idx > N:
-            idx = N
-        segment = pink[:idx]
-        
-        # Estimate fractal dimension
-        D = fractal_dimension_1d(segment)
-        fractal_dims.append(D)
-        
-        # Compute PSD using Welch's method
-        freq, psd = welch(segment, nperseg=min(256, len(segment)))
-        freqs_all.append(freq)
-        psd_all.append(psd)
-        
-        if i % 20 == 0 or i == num_frames:
-            print(f"Computed {i}/{num_frames} frames")
+    return D, freq, psd
+
+def _setup_figure(pink, fd_ylim, psd_ymax):
+    """
+    Build the off-screen three-panel figure used to render animation frames.
     
-    # Set up the figure and axes
-    fig, axs = plt.subplots(3, 1, figsize=(10, 12))
+    All axis limits are fixed up front so frames only need to redraw the lines.
+    
+    Parameters:
+        pink (numpy.ndarray): Full pink noise signal, used to fix the axis limits.
+        fd_ylim (tuple of float): y-axis limits for the fractal dimension panel.
+        psd_ymax (float): Upper y-axis limit for the PSD panel.
+        
+    Returns:
+        tuple: (fig, axs, lines) with lines being the time, fractal dimension and PSD Line2D artists.
+    """
+    N = len(pink)
+    fig = Figure(figsize=(10, 12))
+    FigureCanvasAgg(fig)
+    axs = fig.subplots(3, 1)
     
     # Time Domain Plot
     axs[0].set_title('Pink Noise Signal')
@@ -112,45 +122,54 @@ def create_pink_noise_gif():
     axs[0].set_ylabel('Amplitude')
     axs[0].set_xlim(0, N)
     axs[0].set_ylim(np.min(pink) - 1, np.max(pink) + 1)
-    line1, = axs[0].plot([], [], color='black')
+    line1, = axs[0].plot([], [], color='black', animated=True)
     
     # Fractal Dimension Plot
     axs[1].set_title('Fractal Dimension Over Time')
     axs[1].set_xlabel('Sample')
     axs[1].set_ylabel('Fractal Dimension')
     axs[1].set_xlim(0, N)
-    axs[1].set_ylim(1, 2)  # Fractal dimension for 1D signals typically between 1 and 2
-    line2, = axs[1].plot([], [], color='blue')
+    axs[1].set_ylim(*fd_ylim)
+    line2, = axs[1].plot([], [], color='blue', animated=True)
     
     # Power Spectral Density (PSD) Plot
     axs[2].set_title('Power Spectral Density (PSD)')
     axs[2].set_xlabel('Frequency')
     axs[2].set_ylabel('PSD')
     axs[2].set_xlim(0, 0.5)  # Normalized frequency (Nyquist frequency = 0.5)
-    axs[2].set_ylim(0, None)  # Dynamic y-axis
-    line3, = axs[2].plot([], [], color='red')
-    
-    plt.tight_layout()
-    
-    def init():
-        """
-        Initialize the animation by setting empty data.
-        """
-        line1.set_data([], [])
-        line2.set_data([], [])
-        line3.set_data([], [])
-        return line1, line2, line3
-    
-    def update(frame):
-        """
-        Update function for animation frames.
+    axs[2].set_ylim(0, psd_ymax)
+    line3, = axs[2].plot([], [], color='red', animated=True)
+    
+    fig.tight_layout()
+    
+    return fig, axs, (line1, line2, line3)
+
+def _render_frames(frames, pink, fractal_dims, freqs_all, psd_all, step, fd_ylim, psd_ymax):
+    """
+    Render a batch of animation frames to RGB arrays on a single reused figure.
+    
+    Parameters:
+        frames (iterable of int): Frame indices to render.
+        pink (numpy.ndarray): Full pink noise signal.
+        fractal_dims (list of float): Precomputed fractal dimension per frame.
+        freqs_all (list of numpy.ndarray): Precomputed PSD frequencies per frame.
+        psd_all (list of numpy.ndarray): Precomputed PSD values per frame.
+        step (int): Number of samples added per frame.
+        fd_ylim (tuple of float): y-axis limits for the fractal dimension panel.
+        psd_ymax (float): Upper y-axis limit for the PSD panel.
         
-        Parameters:
-            frame (int): Current frame index.
-            
-        Returns:
-            tuple: Updated plot lines.
-        """
+    Returns:
+        list of numpy.ndarray: One (height, width, 3) uint8 image per frame.
+    """
+    N = len(pink)
+    fig, axs, (line1, line2, line3) = _setup_figure(pink, fd_ylim, psd_ymax)
+    
+    # Draw the static axes once and blit only the lines on top of it per frame
+    fig.canvas.draw()
+    background = fig.canvas.copy_from_bbox(fig.bbox)
+    images = []
+    
+    for frame in frames:
         # Update Time Domain Plot
         current_sample = (frame + 1) * step
         if current_sample > N:
@@ -170,20 +189,51 @@ def create_pink_noise_gif():
         freq = freqs_all[frame]
         psd = psd_all[frame]
         line3.set_data(freq, psd)
-        axs[2].set_ylim(0, max(psd) * 1.1)  # Adjust y-axis dynamically
         
-        return line1, line2, line3
+        # Restore the background, draw the lines and keep the RGB channels
+        fig.canvas.restore_region(background)
+        for ax, line in zip(axs, (line1, line2, line3)):
+            ax.draw_artist(line)
+        images.append(np.asarray(fig.canvas.buffer_rgba())[..., :3].copy())
     
-    # Create the animation
-    print("Creating animation...")
-    anim = FuncAnimation(fig, update, frames=num_frames, init_func=init, blit=False, interval=50)
+    return images
+
+def create_pink_noise_animation():
+    """
+    Create an MP4 animation of pink noise with accompanying Fractal Dimension and PSD plots.
+    """
+    # Parameters
+    N = 2048                   # Total number of samples
+    num_frames = 200           # Number of frames in the animation
+    step = max(1, N // num_frames)  # Step size for each frame
     
-    # Save the animation as a GIF
-    print("Saving GIF... This may take a while.")
-    anim.save('pink_noise_animation.gif', writer='pillow', fps=20)
-    print("GIF saved as 'pink_noise_animation.gif'")
+    # Generate pink noise
+    pink = generate_pink_noise(N)
     
-    plt.close(fig)  # Close the figure to free memory
+    # Precompute fractal dimensions and PSDs for all frames
+    print("Precomputing Fractal Dimensions and PSDs...")
+    results = [_precompute_frame(pink, min(i * step, N)) for i in range(1, num_frames + 1)]
+    fractal_dims, freqs_all, psd_all = (list(r) for r in zip(*results))
+    print(f"Computed {num_frames}/{num_frames} frames")
+    
+    # Fix axis limits for the whole animation
+    fd_ylim = (min(1, min(fractal_dims)), max(2, max(fractal_dims)))  # Typically between 1 and 2 for 1D signals
+    psd_ymax = max(p.max() for p in psd_all) * 1.1
+    
+    # Render frames in parallel in small contiguous batches, streaming each batch
+    # into the encoder as it arrives so only a few batches are held in memory
+    print("Rendering and saving MP4...")
+    batches = np.array_split(np.arange(num_frames), -(-num_frames // 10))
+    rendered = Parallel(n_jobs=-1, backend='loky', return_as='generator')(
+        delayed(_render_frames)(batch, pink, fractal_dims, freqs_all, psd_all, step, fd_ylim, psd_ymax)
+        for batch in batches
+    )
+    with iio.imopen('pink_noise_animation.mp4', 'w', plugin='pyav') as out:
+        out.init_video_stream('libx264', fps=20)
+        for images in rendered:
+            for image in images:
+                out.write_frame(image)
+    print("MP4 saved as 'pink_noise_animation.mp4'")
 
 if __name__ == "__main__":
-    create_pink_noise_gif()
+    create_pink_noise_animation()
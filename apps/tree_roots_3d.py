@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 import streamlit as st
 import numpy as np
 import plotly.graph_objects as go
@@ -32,23 +34,56 @@ def cylinder_mesh(p0, p1, radius_base, radius_top, sections=8):
     circle_base *= radius_base
     circle_top *= radius_top
 
-    # Points at base and top
-    base_points = p0[:, None] + circle_base
-    top_points = p1[:, None] + circle_top
+    # Points at base and top, stacked as a (2 * sections, 3) vertex array
+    verts = np.empty((2 * sections, 3), dtype=np.float32)
+    verts[:sections] = (p0[:, None] + circle_base).T
+    verts[sections:] = (p1[:, None] + circle_top).T
+
+    return verts, cylinder_faces(sections)
 
-    # Combine points
-    x = np.hstack([base_points[0], top_points[0]])
-    y = np.hstack([base_points[1], top_points[1]])
-    z = np.hstack([base_points[2], top_points[2]])
+@lru_cache(maxsize=None)
+def cylinder_faces(sections=8):
+    """
+    Triangle indices for the side of a cylinder whose base ring is vertices
+    0..sections-1 and top ring is sections..2*sections-1.
 
-    # Create faces
-    faces = []
+    The array is cached and shared between calls, so it is returned read-only.
+    """
     n = sections
-    for i in range(n):
-        next_i = (i + 1) % n
-        faces.append([i, next_i, n + next_i])
-        faces.append([i, n + next_i, n + i])
-    return x, y, z, faces
+    i = np.arange(n, dtype=np.int32)
+    next_i = (i + 1) % n
+    faces = np.empty((2 * n, 3), dtype=np.int32)
+    faces[0::2] = np.stack([i, next_i, n + next_i], axis=1)
+    faces[1::2] = np.stack([i, n + next_i, n + i], axis=1)
+    faces.setflags(write=False)
+    return faces
+
+def mesh_buffers(capacity=64, sections=8):
+    """
+    Preallocate flat vertex/face buffers for `capacity` cylinders; mesh_append grows them as needed.
+    """
+    return {
+        'verts': np.empty((capacity * 2 * sections, 3), dtype=np.float32),
+        'faces': np.empty((capacity * 2 * sections, 3), dtype=np.int32),
+        'n_verts': 0,
+        'n_faces': 0
+    }
+
+def mesh_append(mesh, verts, faces):
+    """
+    Append one cylinder to the mesh buffers, doubling their size when full.
+    """
+    nv, nf = mesh['n_verts'], mesh['n_faces']
+    for key, used, extra in (('verts', nv, len(verts)), ('faces', nf, len(faces))):
+        buffer = mesh[key]
+        if used + extra > len(buffer):
+            grown = np.empty((max(2 * len(buffer), used + extra), 3), dtype=buffer.dtype)
+            grown[:used] = buffer[:used]
+            mesh[key] = grown
+    mesh['verts'][nv:nv + len(verts)] = verts
+    mesh['faces'][nf:nf + len(faces)] = faces + nv
+    mesh['n_verts'] = nv + len(verts)
+    mesh['n_faces'] = nf + len(faces)
 
 def rotate_vector(v, k, theta):
     """
@@ -58,7 +93,7 @@ def rotate_vector(v, k, theta):
     return v_rot
 
 def grow_tree(p0, direction, length, radius_base, taper_ratio, levels, angle, length_reduction,
-              branches_per_level, tree_elements, is_root=False):
+              branches_per_level, mesh, is_root=False):
     """
     Recursively grow the tree from point p0 in a given direction.
     """
@@ -77,15 +112,9 @@ def grow_tree(p0, direction, length, radius_base, taper_ratio, levels, angle, le
 
     # Add the cylinder representing the trunk or branch
     cylinder = cylinder_mesh(p0, p1, radius_base, radius_top)
-    if cylinder:
-        x, y, z, faces = cylinder
-        tree_elements.append({
-            'x': x,
-            'y': y,
-            'z': z,
-            'faces': faces,
-            'color': 'saddlebrown' if not is_root else 'sienna'
-        })
+    if cylinder is not None:
+        verts, faces = cylinder
+        mesh_append(mesh, verts, faces)
 
     # Calculate base radius of child branches
     N = branches_per_level
@@ -146,36 +175,30 @@ def grow_tree(p0, direction, length, radius_base, taper_ratio, levels, angle, le
             angle,
             length_reduction,
             branches_per_level,
-            tree_elements,
+            mesh,
             is_root=is_root
         )
 
-def plot_tree():
-    # Sidebar sliders for crown parameters
-    st.sidebar.header("Crown Parameters")
-    crown_levels = st.sidebar.slider('Crown Levels', min_value=1, max_value=8, value=5, step=1)
-    crown_length = st.sidebar.slider('Crown Length', min_value=1.0, max_value=15.0, value=7.0, step=0.5)
-    crown_radius = st.sidebar.slider('Crown Radius', min_value=0.1, max_value=1.5, value=0.5, step=0.1)
-    crown_taper_ratio = st.sidebar.slider('Crown Taper', min_value=0.5, max_value=1.0, value=0.7, step=0.05)
-    crown_angle_deg = st.sidebar.slider('Crown Angle', min_value=10, max_value=80, value=30, step=5)
-    crown_length_reduction = st.sidebar.slider('Crown Length Red.', min_value=0.5, max_value=1.0, value=0.7, step=0.05)
-    crown_branches_per_level = st.sidebar.slider('Crown Branches', min_value=0, max_value=8, value=3, step=1)
+@st.cache_data(show_spinner=False)
+def build_tree(crown_params, root_params, seed):
+    """
+    Build the tree figure; cached on the slider values and seed so unchanged inputs redraw instantly.
+    """
+    (crown_levels, crown_length, crown_radius, crown_taper_ratio, crown_angle_deg,
+     crown_length_reduction, crown_branches_per_level) = crown_params
+    (root_levels, root_length, root_radius, root_taper_ratio, root_angle_deg,
+     root_length_reduction, root_branches_per_level) = root_params
 
-    # Sidebar sliders for root parameters
-    st.sidebar.header("Root Parameters")
-    root_levels = st.sidebar.slider('Root Levels', min_value=1, max_value=8, value=4, step=1)
-    root_length = st.sidebar.slider('Root Length', min_value=1.0, max_value=15.0, value=5.0, step=0.5)
-    root_radius = st.sidebar.slider('Root Radius', min_value=0.1, max_value=1.5, value=0.4, step=0.1)
-    root_taper_ratio = st.sidebar.slider('Root Taper', min_value=0.5, max_value=1.0, value=0.7, step=0.05)
-    root_angle_deg = st.sidebar.slider('Root Angle', min_value=-80, max_value=80, value=45, step=5)
-    root_length_reduction = st.sidebar.slider('Root Length Red.', min_value=0.5, max_value=1.0, value=0.8, step=0.05)
-    root_branches_per_level = st.sidebar.slider('Root Branches', min_value=0, max_value=8, value=2, step=1)
+    # Seed the branch rotations so the figure is reproducible for a given cache key
+    np.random.seed(seed)
 
     # Convert angles from degrees to radians
     crown_angle_rad = np.deg2rad(crown_angle_deg)
     root_angle_rad = np.deg2rad(root_angle_deg)
 
-    tree_elements = []
+    crown_mesh = mesh_buffers()
+    root_mesh = mesh_buffers()
+
     # Start with the main trunk (above ground)
     p0 = np.array([0, 0, 0])
     direction = np.array([0, 0, 1])  # Grow upwards
@@ -189,7 +212,7 @@ def plot_tree():
         crown_angle_rad,
         crown_length_reduction,
         crown_branches_per_level,
-        tree_elements,
+        crown_mesh,
         is_root=False
     )
 
@@ -205,21 +228,23 @@ def plot_tree():
         root_angle_rad,
         root_length_reduction,
         root_branches_per_level,
-        tree_elements,
+        root_mesh,
         is_root=True
     )
 
     # Plotting
     fig = go.Figure()
-    for elem in tree_elements:
+    for mesh, color in ((crown_mesh, 'saddlebrown'), (root_mesh, 'sienna')):
+        verts = mesh['verts'][:mesh['n_verts']]
+        faces = mesh['faces'][:mesh['n_faces']]
         fig.add_trace(go.Mesh3d(
-            x=elem['x'],
-            y=elem['y'],
-            z=elem['z'],
-            i=[face[0] for face in elem['faces']],
-            j=[face[1] for face in elem['faces']],
-            k=[face[2] for face in elem['faces']],
-            color=elem['color'],
+            x=verts[:, 0],
+            y=verts[:, 1],
+            z=verts[:, 2],
+            i=faces[:, 0],
+            j=faces[:, 1],
+            k=faces[:, 2],
+            color=color,
             flatshading=True,
             lighting=dict(ambient=0.5, diffuse=0.8, roughness=0.9),
             showscale=False
@@ -234,6 +259,38 @@ def plot_tree():
         showlegend=False,
         margin=dict(l=0, r=0, t=0, b=0)
     )
+    return fig
+
+def plot_tree():
+    # Sidebar sliders for crown parameters
+    st.sidebar.header("Crown Parameters")
+    crown_levels = st.sidebar.slider('Crown Levels', min_value=1, max_value=8, value=5, step=1)
+    crown_length = st.sidebar.slider('Crown Length', min_value=1.0, max_value=15.0, value=7.0, step=0.5)
+    crown_radius = st.sidebar.slider('Crown Radius', min_value=0.1, max_value=1.5, value=0.5, step=0.1)
+    crown_taper_ratio = st.sidebar.slider('Crown Taper', min_value=0.5, max_value=1.0, value=0.7, step=0.05)
+    crown_angle_deg = st.sidebar.slider('Crown Angle', min_value=10, max_value=80, value=30, step=5)
+    crown_length_reduction = st.sidebar.slider('Crown Length Red.', min_value=0.5, max_value=1.0, value=0.7, step=0.05)
+    crown_branches_per_level = st.sidebar.slider('Crown Branches', min_value=0, max_value=8, value=3, step=1)
+
+    # Sidebar sliders for root parameters
+    st.sidebar.header("Root Parameters")
+    root_levels = st.sidebar.slider('Root Levels', min_value=1, max_value=8, value=4, step=1)
+    root_length = st.sidebar.slider('Root Length', min_value=1.0, max_value=15.0, value=5.0, step=0.5)
+    root_radius = st.sidebar.slider('Root Radius', min_value=0.1, max_value=1.5, value=0.4, step=0.1)
+    root_taper_ratio = st.sidebar.slider('Root Taper', min_value=0.5, max_value=1.0, value=0.7, step=0.05)
+    root_angle_deg = st.sidebar.slider('Root Angle', min_value=-80, max_value=80, value=45, step=5)
+    root_length_reduction = st.sidebar.slider('Root Length Red.', min_value=0.5, max_value=1.0, value=0.8, step=0.05)
+    root_branches_per_level = st.sidebar.slider('Root Branches', min_value=0, max_value=8, value=2, step=1)
+
+    # Sidebar input for the random seed so a given layout can be reproduced
+    st.sidebar.header("Randomness")
+    seed = st.sidebar.number_input('Random Seed', min_value=0, value=0, step=1)
+
+    crown_params = (crown_levels, crown_length, crown_radius, crown_taper_ratio, crown_angle_deg,
+                    crown_length_reduction, crown_branches_per_level)
+    root_params = (root_levels, root_length, root_radius, root_taper_ratio, root_angle_deg,
+                   root_length_reduction, root_branches_per_level)
+    fig = build_tree(crown_params, root_params, int(seed))
     st.plotly_chart(fig, use_container_width=True)
 
 # Run the app
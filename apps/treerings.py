@@ -4,12 +4,72 @@ import streamlit as st
 import plotly.graph_objects as go
 import numpy as np
 
-# Function to create a regular hexagon
+# Unit hexagon vertices, shared by every cell
+_ANGLES = np.linspace(0, 2 * np.pi, 7)  # 6 sides + closing point
+_UNIT_HEX = np.stack([np.cos(_ANGLES), np.sin(_ANGLES)], axis=1)
+
+# Function to create regular hexagons; array centers give an (n, 7, 2) stack
 def create_hexagon(center_x, center_y, size):
-    angles = np.linspace(0, 2 * np.pi, 7)  # 6 sides + closing point
-    x = center_x + size * np.cos(angles)
-    y = center_y + size * np.sin(angles)
-    return list(zip(x, y))
+    centers = np.stack([center_x, center_y], axis=-1)
+    return centers[..., None, :] + size * _UNIT_HEX
+
+# Flatten a stack of hexagons into x/y outlines, with NaN gaps between cells
+def hexagon_outlines(hexagons):
+    gaps = np.full((len(hexagons), 1, 2), np.nan)
+    coords = np.concatenate([hexagons, gaps], axis=1).reshape(-1, 2)
+    return coords[:, 0], coords[:, 1]
+
+# Build ring boundaries and hexagon outlines; cached on the geometry parameters
+@st.cache_data(show_spinner=False)
+def build_rings(num_years, growth_rate, cells_per_ring, hex_size):
+    # Initial position
+    initial_x = 0
+
+    # Calculate cumulative x positions for each ring using logarithmic growth
+    radii = [initial_x]
+    for i in range(1, num_years + 1):
+        x_increment = growth_rate * np.log(1 + i)
+        new_x = radii[-1] + x_increment
+        radii.append(new_x)
+
+    # Calculate vertical and horizontal spacing based on hexagon size
+    vertical_spacing = hex_size * np.sqrt(3)  # Height of a hexagon is size * sqrt(3)
+    horizontal_spacing = hex_size * 1.5       # Horizontal distance between centers
+
+    # Accumulate hexagon stacks per wood type
+    early_hexagons = []
+    late_hexagons = []
+
+    # Build each ring's staggered grid of cells in one shot
+    rows = np.arange(cells_per_ring)
+    for year in range(1, num_years + 1):
+        x_start = radii[year - 1]
+        x_end = radii[year]
+        ring_width = x_end - x_start
+
+        # Number of columns in each ring based on ring width
+        num_columns = int(np.ceil(ring_width / horizontal_spacing)) + 1
+        CC, RR = np.meshgrid(np.arange(num_columns), rows)
+
+        # Calculate center positions, staggering every other row
+        center_x = x_start + CC * horizontal_spacing + (RR % 2) * (horizontal_spacing / 2)
+        center_y = RR * vertical_spacing
+
+        # Keep hexagons whose center is within the ring boundaries
+        valid = (center_x - hex_size <= x_end) & (center_x + hex_size >= x_start)
+
+        # Alternate between early wood and late wood
+        is_early = (year + RR + CC) % 2 == 0
+
+        early = valid & is_early
+        late = valid & ~is_early
+        early_hexagons.append(create_hexagon(center_x[early], center_y[early], hex_size))
+        late_hexagons.append(create_hexagon(center_x[late], center_y[late], hex_size * 0.8))  # Smaller size for late wood
+
+    early_x, early_y = hexagon_outlines(np.concatenate(early_hexagons))
+    late_x, late_y = hexagon_outlines(np.concatenate(late_hexagons))
+
+    return radii, early_x, early_y, late_x, late_y
 
 # Set the title of the Streamlit app
 st.title("Tree Growth Rings Simulation - Linear Core Visualization")
@@ -24,16 +84,6 @@ cells_per_ring = st.sidebar.slider("Cells per Ring (Vertical)", min_value=3, max
 cell_wall_thickness = st.sidebar.slider("Cell Wall Thickness", min_value=0.1, max_value=2.0, value=0.5, step=0.1)
 hex_size = st.sidebar.slider("Hexagon Size", min_value=0.1, max_value=2.0, value=0.5, step=0.1)
 
-# Initial position
-initial_x = 0
-
-# Calculate cumulative x positions for each ring using logarithmic growth
-radii = [initial_x]
-for i in range(1, num_years + 1):
-    x_increment = growth_rate * np.log(1 + i)
-    new_x = radii[-1] + x_increment
-    radii.append(new_x)
-
 # Define colors
 early_wood_color = 'peru'         # Early wood
 late_wood_color = 'saddlebrown'   # Late wood
@@ -42,57 +92,28 @@ cell_wall_color = 'black'
 # Create Plotly figure
 fig = go.Figure()
 
-# Calculate vertical and horizontal spacing based on hexagon size
-vertical_spacing = hex_size * np.sqrt(3)  # Height of a hexagon is size * sqrt(3)
-horizontal_spacing = hex_size * 1.5       # Horizontal distance between centers
-
-# Iterate over each year to create cells
-for year in range(1, num_years + 1):
-    x_start = radii[year - 1]
-    x_end = radii[year]
-    ring_width = x_end - x_start
-
-    # Number of columns in each ring based on ring width
-    num_columns = int(np.ceil(ring_width / horizontal_spacing)) + 1
-
-    # Loop over rows and columns to create hexagons
-    for row in range(cells_per_ring):
-        for col in range(num_columns):
-            # Calculate center positions
-            center_x = x_start + col * horizontal_spacing
-            center_y = row * vertical_spacing
-
-            # Stagger every other row
-            if row % 2 == 1:
-                center_x += horizontal_spacing / 2
-
-            # Check if hexagon center is within the ring boundaries
-            if center_x - hex_size > x_end or center_x + hex_size < x_start:
-                continue
-
-            # Alternate between early wood and late wood
-            if (year + row + col) % 2 == 0:
-                cell_type = "Early Wood"
-                fill_color = early_wood_color
-                current_hex_size = hex_size
-            else:
-                cell_type = "Late Wood"
-                fill_color = late_wood_color
-                current_hex_size = hex_size * 0.8  # Smaller size for late wood
-
-            # Create hexagon coordinates
-            hex_coords = create_hexagon(center_x, center_y, current_hex_size)
-
-            # Add hexagon to the figure
-            fig.add_trace(go.Scatter(
-                x=[point[0] for point in hex_coords],
-                y=[point[1] for point in hex_coords],
-                mode='lines',
-                fill='toself',
-                fillcolor=fill_color,
-                line=dict(color=cell_wall_color, width=cell_wall_thickness),
-                showlegend=False
-            ))
+# Build the ring geometry (cached across reruns)
+radii, early_x, early_y, late_x, late_y = build_rings(num_years, growth_rate, cells_per_ring, hex_size)
+
+# Add one trace per wood type; these also serve as the legend entries
+fig.add_trace(go.Scatter(
+    x=early_x,
+    y=early_y,
+    mode='lines',
+    fill='toself',
+    fillcolor=early_wood_color,
+    line=dict(color=cell_wall_color, width=cell_wall_thickness),
+    name='Early Wood'
+))
+fig.add_trace(go.Scatter(
+    x=late_x,
+    y=late_y,
+    mode='lines',
+    fill='toself',
+    fillcolor=late_wood_color,
+    line=dict(color=cell_wall_color, width=cell_wall_thickness),
+    name='Late Wood'
+))
 
 # Customize layout
 fig.update_layout(
@@ -118,22 +139,6 @@ fig.update_layout(
     margin=dict(l=50, r=50, t=50, b=50)
 )
 
-# Add legend manually
-fig.add_trace(go.Scatter(
-    x=[None],
-    y=[None],
-    mode='markers',
-    marker=dict(size=10, color=early_wood_color),
-    name='Early Wood'
-))
-fig.add_trace(go.Scatter(
-    x=[None],
-    y=[None],
-    mode='markers',
-    marker=dict(size=10, color=late_wood_color),
-    name='Late Wood'
-))
-
 fig.update_layout(showlegend=True)
 
 # Display the figure in Streamlit
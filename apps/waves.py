@@ -1,7 +1,9 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-from scipy.signal import welch
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import imageio.v3 as iio
+from scipy import fft as sp_fft
+from scipy.signal import welch, get_window
 import sys
 
 def simulate_wave_tide_data(
@@ -11,7 +13,8 @@ def simulate_wave_tide_data(
     wave_periods_hours=[0.25, 0.5, 1.0, 2.0],
     tide_amplitude=1.0,
     wave_amplitudes=[0.9, 0.5, 0.3, 0.2],
-    noise_std=0.15
+    noise_std=0.15,
+    seed=None
 ):
     """
     Simulate wave and tide height data over a specified number of days.
@@ -24,36 +27,43 @@ def simulate_wave_tide_data(
         tide_amplitude (float): Amplitude of the tide.
         wave_amplitudes (list of float): Amplitudes of the waves.
         noise_std (float): Standard deviation of the added Gaussian noise.
+        seed (int, optional): Seed for the noise random number generator.
 
     Returns:
-        time (numpy.ndarray): Time array in hours.
-        signal (numpy.ndarray): Simulated wave and tide signal.
+        time (numpy.ndarray): Time array in hours (float32).
+        signal (numpy.ndarray): Simulated wave and tide signal (float32).
     """
     # Total number of samples
     total_minutes = total_days * 24 * 60
     num_samples = int(total_minutes / sampling_interval_minutes) + 1
 
-    # Time array in hours
-    time = np.linspace(0, total_days * 24, num_samples)
+    # Time array in hours; single precision is plenty for plotting and halves memory traffic
+    time = np.linspace(0, total_days * 24, num_samples, dtype=np.float32)
 
-    # Initialize signal with zeros
-    signal = np.zeros(num_samples)
+    # Preallocate the signal and a scratch buffer for the noise
+    signal = np.empty(num_samples, dtype=np.float32)
+    noise = np.empty(num_samples, dtype=np.float32)
 
-    # Add tide component (dominant sine wave)
+    # Add tide component (dominant sine wave), computed in place
     tide_frequency = 1 / tide_period_hours  # cycles per hour
-    signal += tide_amplitude * np.sin(2 * np.pi * tide_frequency * time)
+    np.multiply(np.float32(2 * np.pi * tide_frequency), time, out=signal)
+    np.sin(signal, out=signal)
+    signal *= tide_amplitude
 
-    # Add wave components (multiple sine waves with shorter periods)
-    for amp, period in zip(wave_amplitudes, wave_periods_hours):
-        wave_frequency = 1 / period  # cycles per hour
-        signal += amp * np.sin(2 * np.pi * wave_frequency * time)
+    # Add wave components (multiple sine waves with shorter periods) as one matrix product
+    wave_frequencies = (1 / np.asarray(wave_periods_hours, dtype=np.float32))[:, None]  # cycles per hour
+    waves = np.sin(np.float32(2 * np.pi) * wave_frequencies * time[None, :])
+    signal += np.asarray(wave_amplitudes, dtype=np.float32) @ waves
 
     # Add Gaussian noise
-    noise = np.random.normal(0, noise_std, num_samples)
+    rng = np.random.default_rng(seed)
+    rng.standard_normal(dtype=np.float32, out=noise)
+    noise *= noise_std
     signal += noise
 
     # Normalize the signal to have zero mean and unit variance
-    signal = (signal - np.mean(signal)) / np.std(signal)
+    np.subtract(signal, signal.mean(), out=signal)
+    np.divide(signal, signal.std(), out=signal)
 
     return time, signal
 
@@ -61,6 +71,9 @@ def fractal_dimension_1d(signal, box_sizes=None):
     """
     Estimate the fractal dimension of a 1D signal using the Box-Counting method.
 
+    The graph of the signal is covered with boxes of each size, giving an
+    estimate between 1 (smooth curve) and 2 (space-filling noise).
+
     Parameters:
         signal (numpy.ndarray): 1D signal.
         box_sizes (list or numpy.ndarray, optional): List of box sizes. If None, default sizes are used.
@@ -72,13 +85,25 @@ def fractal_dimension_1d(signal, box_sizes=None):
         # Define box sizes logarithmically spaced
         box_sizes = np.floor(np.logspace(0.5, np.log10(len(signal)//2), num=10)).astype(int)
 
+    box_sizes = np.asarray(box_sizes)
     box_sizes = box_sizes[box_sizes > 0]  # Ensure box sizes are positive
-    N_boxes = []
 
-    for size in box_sizes:
-        # Number of boxes needed for current size
-        count = int(np.ceil(len(signal) / size))
-        N_boxes.append(count)
+    # Rescale the amplitude so the graph spans n units vertically, matching the sample axis
+    n = len(signal)
+    span = np.max(signal) - np.min(signal)
+    if span > 0:
+        scaled = (signal - np.min(signal)) * (n / span)
+    else:
+        scaled = np.zeros(n)
+
+    # Number of boxes needed to cover the graph: per block of `size` samples,
+    # enough boxes to span the block's range plus one
+    N_boxes = np.empty(len(box_sizes))
+    for i, size in enumerate(box_sizes):
+        m = n // size
+        blocks = scaled[:m * size].reshape(m, size)
+        ranges = blocks.max(axis=1) - blocks.min(axis=1)
+        N_boxes[i] = (np.ceil(ranges / size) + 1).sum()
 
     log_sizes = np.log(1 / box_sizes)
     log_N = np.log(N_boxes)
@@ -89,9 +114,101 @@ def fractal_dimension_1d(signal, box_sizes=None):
 
     return D
 
-def create_wave_tide_gif():
+def prefix_fractal_dimensions(signal, ends, box_sizes=None):
     """
-    Create a GIF animation of simulated wave and tide data with accompanying Fractal Dimension and PSD plots.
+    Estimate the fractal dimension of several leading segments signal[:end] at once.
+
+    Uses the same graph-cover box count as fractal_dimension_1d, but with one fixed
+    set of box sizes for every segment. Blocks of a given size start at the same
+    samples whatever the segment length, so their min/max are computed once for the
+    whole signal and each segment reuses the blocks that fit inside it.
+
+    Parameters:
+        signal (numpy.ndarray): 1D signal.
+        ends (list of int): Segment lengths to evaluate.
+        box_sizes (list or numpy.ndarray, optional): List of box sizes. If None, default sizes are used.
+
+    Returns:
+        dims (numpy.ndarray): Estimated fractal dimension for each segment.
+    """
+    n = len(signal)
+    if box_sizes is None:
+        # Define box sizes logarithmically spaced over the full signal
+        box_sizes = np.floor(np.logspace(0.5, np.log10(n//2), num=10)).astype(int)
+
+    box_sizes = np.asarray(box_sizes)
+    box_sizes = box_sizes[box_sizes > 0]  # Ensure box sizes are positive
+
+    # Min/max of every full block of each size over the whole signal
+    block_ranges = []
+    for size in box_sizes:
+        m = n // size
+        blocks = signal[:m * size].reshape(m, size)
+        block_ranges.append(blocks.max(axis=1) - blocks.min(axis=1))
+
+    # Range of each leading segment, for the amplitude rescaling
+    running_min = np.minimum.accumulate(signal)
+    running_max = np.maximum.accumulate(signal)
+
+    dims = np.empty(len(ends))
+    for f, end in enumerate(ends):
+        span = running_max[end - 1] - running_min[end - 1]
+        num_blocks = end // box_sizes
+        usable = num_blocks >= 2  # Same upper bound as the default sizes: end // 2
+        if span == 0 or usable.sum() < 2:
+            dims[f] = fractal_dimension_1d(signal[:end])
+            continue
+
+        # Rescale block ranges so the segment spans `end` units vertically
+        scale = end / span
+        N_boxes = [
+            (np.ceil(block_ranges[b][:num_blocks[b]] * scale / box_sizes[b]) + 1).sum()
+            for b in np.flatnonzero(usable)
+        ]
+
+        log_sizes = np.log(1 / box_sizes[usable])
+        log_N = np.log(N_boxes)
+
+        # Perform linear fit to estimate the slope (fractal dimension)
+        dims[f] = np.polyfit(log_sizes, log_N, 1)[0]
+
+    return dims
+
+def welch_periodograms(signal, fs, nperseg=256):
+    """
+    Compute the scaled, one-sided periodogram of every Welch window of a signal.
+
+    Windows use the same defaults as scipy.signal.welch (Hann window, 50% overlap,
+    constant detrend, density scaling), so averaging the first k rows gives the
+    Welch PSD of any prefix that contains exactly those k windows.
+
+    Parameters:
+        signal (numpy.ndarray): 1D signal.
+        fs (float): Sampling frequency.
+        nperseg (int): Length of each window.
+
+    Returns:
+        freq (numpy.ndarray): Frequencies of the PSD bins.
+        periodograms (numpy.ndarray): Array of shape (n_windows, len(freq)).
+    """
+    window = get_window('hann', nperseg)
+    windows = np.lib.stride_tricks.sliding_window_view(signal, nperseg)[::nperseg // 2]
+    segments = (windows - windows.mean(axis=1, keepdims=True)) * window
+
+    periodograms = np.abs(sp_fft.rfft(segments, axis=1, workers=-1)) ** 2
+    periodograms /= fs * (window * window).sum()
+    # Double the bins that fold in negative frequencies (all but DC and, for even nperseg, Nyquist)
+    if nperseg % 2:
+        periodograms[:, 1:] *= 2
+    else:
+        periodograms[:, 1:-1] *= 2
+
+    freq = sp_fft.rfftfreq(nperseg, d=1 / fs)
+    return freq, periodograms
+
+def create_wave_tide_animation():
+    """
+    Create an MP4 animation of simulated wave and tide data with accompanying Fractal Dimension and PSD plots.
     """
     # Simulation Parameters
     total_days = 28
@@ -118,31 +235,36 @@ def create_wave_tide_gif():
     step = max(1, len(signal) // num_frames)
 
     # Precompute fractal dimensions and PSDs for all frames
-    fractal_dims = []
-    freqs_all = []
+    print("Precomputing Fractal Dimensions and PSDs...")
+    ends = [min(i * step, len(signal)) for i in range(1, num_frames + 1)]
+    fractal_dims = prefix_fractal_dimensions(signal, ends).tolist()
     psd_all = []
 
-    print("Precomputing Fractal Dimensions and PSDs...")
-    for i in range(1, num_frames + 1):
-        idx = i * step
-        if idx > len(signal):
-            idx = len(signal)
-        segment = signal[:idx]
-
-        # Estimate fractal dimension
-        D = fractal_dimension_1d(segment)
-        fractal_dims.append(D)
-
-        # Compute PSD using Welch's method
-        freq, psd = welch(segment, fs=1/(sampling_interval_minutes/60))  # Convert sampling interval to Hz
-        freqs_all.append(freq)
+    # Per-window periodograms of the full signal; each frame's Welch PSD averages a prefix of them
+    fs = 1 / (sampling_interval_minutes / 60)  # Convert sampling interval to Hz
+    nperseg = 256
+    welch_step = nperseg // 2
+    freqs, periodograms = welch_periodograms(signal, fs, nperseg)  # Frequency axis shared by every frame
+    periodogram_totals = np.cumsum(periodograms, axis=0)  # Running sums, so each average is O(len(freqs))
+
+    for i, idx in enumerate(ends, start=1):
+        # Compute PSD using Welch's method, averaging the windows that fit in the segment
+        if idx >= nperseg:
+            num_windows = (idx - nperseg) // welch_step + 1
+            psd = periodogram_totals[num_windows - 1] / num_windows
+        else:
+            # Too short for a full window: single zero-padded window on the same frequency grid
+            segment = signal[:idx]
+            _, psd = welch(segment, fs=fs, nperseg=idx, nfft=nperseg)
         psd_all.append(psd)
 
         if i % 20 == 0 or i == num_frames:
             print(f"Computed {i}/{num_frames} frames")
 
     # Set up the figure and axes
-    fig, axs = plt.subplots(3, 1, figsize=(14, 18))
+    fig = Figure(figsize=(14, 18))
+    FigureCanvasAgg(fig)
+    axs = fig.subplots(3, 1)
 
     # Time Domain Plot
     axs[0].set_title('Simulated Wave and Tide Signal')
@@ -150,7 +272,7 @@ def create_wave_tide_gif():
     axs[0].set_ylabel('Normalized Height')
     axs[0].set_xlim(0, total_days * 24)
     axs[0].set_ylim(np.min(signal) - 0.5, np.max(signal) + 0.5)
-    line1, = axs[0].plot([], [], color='blue')
+    line1, = axs[0].plot([], [], color='blue', animated=True)
 
     # Fractal Dimension Plot
     axs[1].set_title('Fractal Dimension Over Time')
@@ -158,20 +280,19 @@ def create_wave_tide_gif():
     axs[1].set_ylabel('Fractal Dimension')
     axs[1].set_xlim(0, total_days * 24)
     axs[1].set_ylim(1, 2.5)  # Adjusted based on expected fractal dimension range
-    line2, = axs[1].plot([], [], color='green')
+    line2, = axs[1].plot([], [], color='green', animated=True)
 
     # Power Spectral Density (PSD) Plot
     axs[2].set_title('Power Spectral Density (PSD)')
     axs[2].set_xlabel('Frequency (Hz)')
     axs[2].set_ylabel('PSD (V**2/Hz)')
     # Determine Nyquist frequency
-    fs = 1 / (sampling_interval_minutes / 60)  # Sampling frequency in Hz
     nyquist = fs / 2
     axs[2].set_xlim(0, nyquist)
-    axs[2].set_ylim(0, None)  # Dynamic y-axis based on data
-    line3, = axs[2].plot([], [], color='red')
+    axs[2].set_ylim(0, max(p.max() for p in psd_all) * 1.1)  # Fixed to the largest PSD over all frames
+    line3, = axs[2].plot([], [], color='red', animated=True)
 
-    plt.tight_layout()
+    fig.tight_layout()
 
     def init():
         """
@@ -190,14 +311,16 @@ def create_wave_tide_gif():
             frame (int): Current frame index.
 
         Returns:
-            tuple: Updated plot lines.
+            tuple: Updated plot lines. line1 only holds the samples added since
+            the previous frame (plus the last one, to join up the segments).
         """
         # Update Time Domain Plot
         current_idx = (frame + 1) * step
         if current_idx > len(signal):
             current_idx = len(signal)
-        x_time = time[:current_idx]
-        y_time = signal[:current_idx]
+        previous_idx = max(0, min(frame * step, len(signal)) - 1)
+        x_time = time[previous_idx:current_idx]
+        y_time = signal[previous_idx:current_idx]
         line1.set_data(x_time, y_time)
         # No need to adjust x-axis limits; they are fixed
 
@@ -208,28 +331,33 @@ def create_wave_tide_gif():
         # No need to adjust x-axis limits; they are fixed
 
         # Update PSD Plot
-        freq = freqs_all[frame]
         psd = psd_all[frame]
-        line3.set_data(freq, psd)
-        axs[2].set_ylim(0, max(psd) * 1.1)  # Adjust y-axis dynamically based on current PSD
+        line3.set_data(freqs, psd)
 
         return line1, line2, line3
 
-    # Create the animation
-    print("Creating animation...")
-    anim = FuncAnimation(fig, update, frames=num_frames, init_func=init, blit=False, interval=100)
+    # Draw the static axes once. The time-domain panel is never restored, so each
+    # frame only draws its new segment on top of the previous ones; the other
+    # panels restore their background and redraw their line.
+    init()
+    fig.canvas.draw()
+    backgrounds = [fig.canvas.copy_from_bbox(ax.bbox) for ax in axs[1:]]
 
-    # Save the animation as a GIF
-    print("Saving GIF... This may take a while.")
+    # Render frames straight into the encoder, reusing the canvas buffer
+    print("Rendering and saving MP4...")
     try:
-        anim.save('wave_tide_animation.gif', writer='pillow', fps=10)
-        print("GIF saved as 'wave_tide_animation.gif'")
+        with iio.imopen('wave_tide_animation.mp4', 'w', plugin='pyav') as out:
+            out.init_video_stream('libx264', fps=10)
+            for frame in range(num_frames):
+                for background in backgrounds:
+                    fig.canvas.restore_region(background)
+                for ax, line in zip(axs, update(frame)):
+                    ax.draw_artist(line)
+                out.write_frame(np.asarray(fig.canvas.buffer_rgba())[..., :3])
+        print("MP4 saved as 'wave_tide_animation.mp4'")
     except KeyboardInterrupt:
-        print("\nGIF creation interrupted by user. Exiting gracefully...")
-        plt.close(fig)
+        print("\nMP4 creation interrupted by user. Exiting gracefully...")
         sys.exit(0)
 
-    plt.close(fig)  # Close the figure to free memory
-
 if __name__ == "__main__":
-    create_wave_tide_gif()
+    create_wave_tide_animation()